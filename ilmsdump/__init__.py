@@ -7,7 +7,6 @@ import dataclasses
 import functools
 import getpass
 import hashlib
-import itertools
 import json
 import os
 import pathlib
@@ -18,23 +17,79 @@ import shutil
 import signal
 import sys
 import time
-import types
 from typing import AsyncGenerator, Awaitable, Iterable, Iterator, List, Optional, Union
 
 import aiohttp
 import click
+import lxml.etree
 import lxml.html
 import wcwidth
 import yarl
 
 import ilmsdump.fileutil
 
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 LOGIN_DOMAIN = 'lms.csmu.edu.tw'
 TARGET_ORIGIN = os.environ.get('ILMSDUMP_TARGET_ORIGIN', 'http://lms.csmu.edu.tw')
 LOGIN_URL = f'{TARGET_ORIGIN}/sys/lib/ajax/login_submit.php'
 LOGIN_STATE_URL = f'{TARGET_ORIGIN}/home.php'
 COURSE_LIST_URL = f'{TARGET_ORIGIN}/home.php?f=allcourse'
 
+# Saved credentials younger than this are trusted without re-validating
+# against home.php.
+CREDENTIALS_MAX_AGE = 300
+
+# XPath expressions are compiled once here so repeated use on the paginated
+# pages does not re-parse the expression strings.
+_XP_ERROR_TEXT = lxml.etree.XPath('//body/div[count(./*)=0]/text()')
+_XP_NO_PERMISSION = lxml.etree.XPath(
+    '//div[contains(@style, "color:#F00;") and '
+    '(starts-with(text(), "權限不足!") or starts-with(text(), "No Permission!"))]'
+    '/text()'
+)
+_XP_LOGIN = lxml.etree.XPath('//*[@id="login"]')
+_XP_PROFILE_NAME = lxml.etree.XPath('//*[@id="profile"]/div[2]/div[1]/text()')
+_XP_COURSE_NAME = lxml.etree.XPath('//span[@class="pointer"]')
+_XP_COURSE_IS_ADMIN = lxml.etree.XPath('//div[@id="main"]//a[@href="javascript:editDoc(1)"]')
+_XP_COURSE_LIST_A = lxml.etree.XPath('.//td[@class="listTD"]/a')
+_XP_PAGE_COMBO = lxml.etree.XPath('//input[@id="PageCombo"]/following-sibling::text()')
+_XP_PAGE_ITEM_HREF = lxml.etree.XPath('//span[@class="page"]/span[@class="item"]/a/@href')
+_XP_NEXT_HREF = lxml.etree.XPath('//span[@class="page"]//a[text()="Next"]/@href')
+_XP_OPEN_COURSE_A = lxml.etree.XPath(
+    '//div[@class="tableBox"]//a[starts-with(@href, "/course/")]'
+)
+_XP_SECOND_ROW_TD = lxml.etree.XPath('//div[@class="tableBox"]/table/tr[2]/td')
+_XP_MAIN = lxml.etree.XPath('//div[@id="main"]')
+_XP_MAIN_JUNK = lxml.etree.XPath('div[@class="infoPath"]|.//script')
+_XP_ATTACH_A = lxml.etree.XPath('.//a[starts-with(@href, "/sys/read_attach.php")]')
+_XP_ITEM_ROWS = lxml.etree.XPath('//*[@id="main"]//tr[@class!="header"]')
+_XP_ROW_LINK = lxml.etree.XPath('td[1]/a')
+_XP_ROW_TITLE_A = lxml.etree.XPath('td[2]//a')
+_XP_MATERIAL_A = lxml.etree.XPath('//*[@id="main"]//tr[@class!="header"]/td[2]/div/a')
+_XP_ROW_VMIDDLE = lxml.etree.XPath('.//img[@class="vmiddle"]')
+_XP_ROW_TITLE_SPAN = lxml.etree.XPath('td[2]//a/span')
+_XP_HOMEWORK_A = lxml.etree.XPath('//*[@id="main"]//tr[@class!="header"]/td[2]/a[1]')
+_XP_TOOLWRAPPER = lxml.etree.XPath('.//span[@class="toolWrapper"]')
+_XP_HW_ALL_TR = lxml.etree.XPath('//div[@class="tableBox"]//tr')
+_XP_HW_DIV_A = lxml.etree.XPath('div/a')
+_XP_HW_COMMENT = lxml.etree.XPath('div/img[@src="/sys/res/icon/hw_comment.png"]/@title')
+_XP_HW_BY = lxml.etree.XPath('div/text()|div/a/text()')
+_XP_SCORE_BACK_BUTTON = lxml.etree.XPath(
+    '//div[@id="main"]//input[@type="button" and @onclick="history.back()"]'
+)
+_XP_VIDEO_SRC = lxml.etree.XPath('//video/@src')
+
+_RE_COURSE_URL = re.compile(r'/course/(\d+)')
+
 
 class ILMSError(Exception):
     """Base exception class for ilmsdump"""
@@ -57,7 +112,7 @@ class Unavailable(ILMSError):
 
     @classmethod
     def check(cls, html: lxml.html.HtmlElement):
-        errors = html.xpath('//body/div[count(./*)=0]/text()')
+        errors = _XP_ERROR_TEXT(html)
         if errors:
             raise cls(errors[0])
 
@@ -74,11 +129,7 @@ class NoPermission(ILMSError):
 
     @classmethod
     def check(cls, html: lxml.html.HtmlElement):
-        no_permission = html.xpath(
-            '//div[contains(@style, "color:#F00;") and '
-            '(starts-with(text(), "權限不足!") or starts-with(text(), "No Permission!"))]'
-            '/text()'
-        )
+        no_permission = _XP_NO_PERMISSION(html)
         if no_permission:
             raise cls(*no_permission)
 
@@ -86,20 +137,13 @@ class NoPermission(ILMSError):
 def as_sync(func):
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
+        if uvloop is not None:
+            uvloop.install()
         return asyncio.run(func(*args, **kwargs))
 
     return wrapper
 
 
-def as_sync_cooperative(func):
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        loop = asyncio.get_event_loop()
-        loop.run_until_complete(func(*args, **kwargs))
-
-    return wrapper
-
-
 class _EmptyAsyncGenerator:
     def __init__(self, coro: Awaitable):
         self._done = False
@@ -123,6 +167,39 @@ def as_empty_async_generator(func):
     return wrapper
 
 
+async def merge_async_generators(*generators: AsyncGenerator) -> AsyncGenerator:
+    """
+    Yield items from all generators as they become available,
+    so their underlying requests run concurrently.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def drain(generator):
+        try:
+            async for item in generator:
+                await queue.put((False, item))
+        except Exception as exc:
+            await queue.put((True, exc))
+        else:
+            await queue.put((True, None))
+
+    tasks = [asyncio.create_task(drain(generator)) for generator in generators]
+    try:
+        remaining = len(tasks)
+        while remaining:
+            is_end, value = await queue.get()
+            if is_end:
+                if value is not None:
+                    raise value
+                remaining -= 1
+            else:
+                yield value
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
 @contextlib.contextmanager
 def capture_keyboard_interrupt() -> Iterator[asyncio.Event]:
     event = asyncio.Event()
@@ -137,32 +214,29 @@ def capture_keyboard_interrupt() -> Iterator[asyncio.Event]:
         signal.signal(signal.SIGINT, old_handler)
 
 
-@as_sync_cooperative
-async def _get_workaround_client_response_content_is_traced():
-    is_traced = False
-
-    async def callback(session, context, params):
-        nonlocal is_traced
-        is_traced = True
+def json_dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8')
 
-    tc = aiohttp.TraceConfig()
-    tc.on_response_chunk_received.append(callback)
 
-    async with aiohttp.ClientSession(trace_configs=[tc]) as client:
-        async with client.get(f'{TARGET_ORIGIN}') as response:
-            async for chunk in response.content.iter_any():
-                pass
-    return is_traced
+def json_loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
 
 
-# https://github.com/aio-libs/aiohttp/issues/5324
-_workaround_client_response_content_is_traced = _get_workaround_client_response_content_is_traced()
+@functools.lru_cache(maxsize=256)
+def _url_query(url: str):
+    return yarl.URL(url).query
 
 
 def qs_get(url: str, key: str) -> str:
-    purl = yarl.URL(url)
+    # The homework and pagination loops look up one field per href, and the
+    # same hrefs recur across pages; cache the parsed query instead of
+    # rebuilding a yarl.URL on every call.
     try:
-        return purl.query[key]
+        return _url_query(url)[key]
     except KeyError:
         raise KeyError(key, url) from None
 
@@ -185,16 +259,39 @@ def _(path: pathlib.PureWindowsPath):
     return f'"{pathstr}"'
 
 
+async def parse_html_stream(
+    client: 'Client', response: aiohttp.ClientResponse
+) -> lxml.html.HtmlElement:
+    """
+    Parse an HTML response incrementally, feeding chunks to the parser as
+    they arrive instead of buffering the whole body into a str first.
+    """
+    parser = lxml.html.HTMLParser(encoding=response.charset or 'utf-8', huge_tree=True)
+    async for chunk in response.content.iter_chunked(32768):
+        client.bytes_downloaded += len(chunk)
+        parser.feed(chunk)
+    return parser.close()
+
+
+async def drain_to_file(response: aiohttp.ClientResponse, file) -> int:
+    """
+    Copy the response body into file with as little per-chunk Python work
+    as possible. Returns the number of bytes written.
+    """
+    total = 0
+    async for chunk, _ in response.content.iter_chunks():
+        if chunk:
+            file.write(chunk)
+            total += len(chunk)
+    return total
+
+
 class Client:
     def __init__(self, data_dir):
         self.bytes_downloaded = 0
 
-        trace_config = aiohttp.TraceConfig()
-        trace_config.on_response_chunk_received.append(self.session_on_response_chunk_received)
-
         self.session = aiohttp.ClientSession(
             raise_for_status=True,
-            trace_configs=[trace_config],
             timeout=aiohttp.ClientTimeout(total=80),
         )
 
@@ -203,6 +300,14 @@ class Client:
 
         self.cred_path = os.path.join(self.data_dir, 'credentials.txt')
 
+        self._phpsessid: Optional[str] = None
+
+        # Bounds concurrent file transfers so a batch of large attachments
+        # cannot monopolize the connection pool.
+        self.download_semaphore = asyncio.Semaphore(16)
+
+        self._dir_cache: dict = {}
+
     async def __aenter__(self):
         return self
 
@@ -244,19 +349,35 @@ class Client:
         except FileNotFoundError:
             if prompt:
                 await self.interactive_login()
-                with open(self.cred_path, 'w', encoding='utf-8') as file:
-                    print(
-                        self.session.cookie_jar.filter_cookies(yarl.URL(LOGIN_STATE_URL))[
-                            'PHPSESSID'
-                        ].value,
-                        file=file,
-                    )
-                self.log('Saved credentials to', self.cred_path)
+                self.save_credentials()
         else:
             with cred_file:
                 self.log('Using existing credentials in', self.cred_path)
-                phpsessid = cred_file.read().strip()
+                phpsessid, _, last_validated = cred_file.read().strip().partition('\n')
+            try:
+                fresh = time.time() - float(last_validated) < CREDENTIALS_MAX_AGE
+            except ValueError:
+                fresh = False
+            if fresh:
+                # Validated moments ago; skip the home.php round-trip.
+                self._set_phpsessid_cookie(phpsessid)
+            else:
                 await self.login_with_phpsessid(phpsessid)
+                self.save_credentials()
+
+    def get_phpsessid(self) -> str:
+        if self._phpsessid is None:
+            # Only reached if the login response carried no Set-Cookie header.
+            self._phpsessid = self.session.cookie_jar.filter_cookies(yarl.URL(LOGIN_STATE_URL))[
+                'PHPSESSID'
+            ].value
+        return self._phpsessid
+
+    def save_credentials(self):
+        with open(self.cred_path, 'w', encoding='utf-8') as file:
+            print(self.get_phpsessid(), file=file)
+            print(int(time.time()), file=file)
+        self.log('Saved credentials to', self.cred_path)
 
     def clear_credentials(self):
         """
@@ -300,19 +421,24 @@ class Client:
         )
         async with login as response:
             response.raise_for_status()
-            json_body = await response.json(
-                content_type=None,  # to bypass application/json check
-            )
+            cookie = response.cookies.get('PHPSESSID')
+            if cookie is not None:
+                self._phpsessid = cookie.value
+            json_body = json_loads(await response.read())
         json_ret = json_body['ret']
         if json_ret['status'] != 'true':
             raise LoginFailed(json_ret)
         self.log('Logged in as', json_ret['name'])
 
-    async def login_with_phpsessid(self, phpsessid):
+    def _set_phpsessid_cookie(self, phpsessid):
+        self._phpsessid = phpsessid
         self.session.cookie_jar.update_cookies(
             {'PHPSESSID': phpsessid},
             response_url=yarl.URL(LOGIN_DOMAIN),
         )
+
+    async def login_with_phpsessid(self, phpsessid):
+        self._set_phpsessid_cookie(phpsessid)
         name = await self.get_login_state()
         if name is None:
             raise LoginFailed('cannot login with provided PHPSESSID')
@@ -320,22 +446,19 @@ class Client:
 
     async def get_login_state(self):
         async with self.session.get(LOGIN_STATE_URL) as response:
-            html = lxml.html.fromstring(await response.text())
+            html = await parse_html_stream(self, response)
 
-            if not html.xpath('//*[@id="login"]'):
+            if not _XP_LOGIN(html):
                 return None
 
-            name_node = html.xpath('//*[@id="profile"]/div[2]/div[1]/text()')
+            name_node = _XP_PROFILE_NAME(html)
             assert name_node
             return ''.join(name_node).strip()
 
-    async def session_on_response_chunk_received(
-        self,
-        session: aiohttp.ClientSession,
-        context: types.SimpleNamespace,
-        params: aiohttp.TraceResponseChunkReceivedParams,
-    ) -> None:
-        self.bytes_downloaded += len(params.chunk)
+    async def read_counted(self, response: aiohttp.ClientResponse) -> bytes:
+        data = await response.read()
+        self.bytes_downloaded += len(data)
+        return data
 
     async def get_course(self, course_id: int) -> 'Course':
         async with self.session.get(
@@ -349,7 +472,7 @@ class Client:
             if response.url.path == '/course_login.php':
                 raise UserError(f'No access to course: course_id={course_id}')
 
-            body = await response.text()
+            body = await self.read_counted(response)
             if not body:
                 raise UserError(
                     'Empty response returned for course, '
@@ -358,14 +481,15 @@ class Client:
 
             html = lxml.html.fromstring(body)
             print("1")
-            (name,) = html.xpath('//span[@class="pointer"]/text()')
+            (name_span,) = _XP_COURSE_NAME(html)
+            name = name_span.text
 
             # (hint,) = html.xpath('//div[@class="infoTable"]//td[2]/span[@class="hint"]/text()')
             # m = re.match(r'\(\w+, (\w+), \w+, \w+\)', hint)
             # assert m is not None, hint
             # serial = m.group(1)
 
-            if html.xpath('//div[@id="main"]//a[@href="javascript:editDoc(1)"]'):
+            if _XP_COURSE_IS_ADMIN(html):
                 is_admin = True
             else:
                 is_admin = False
@@ -381,16 +505,15 @@ class Client:
 
     async def get_enrolled_courses(self) -> AsyncGenerator['Course', None]:
         async with self.session.get(COURSE_LIST_URL) as response:
-            body = await response.text()
-            html = lxml.html.fromstring(body)
+            html = await parse_html_stream(self, response)
 
             try:
                 Unavailable.check(html)
             except Unavailable:
                 raise UserError('Cannot get enrolled courses. Are you logged in?')
 
-            for a in html.xpath('.//td[@class="listTD"]/a'):
-                bs = a.xpath('b')
+            for a in _XP_COURSE_LIST_A(html):
+                bs = a.findall('b')
                 if bs:
                     is_admin = True
                     (tag,) = bs
@@ -401,7 +524,7 @@ class Client:
                 name = tag.text
                 serial = a.getparent().getparent()[0].text
 
-                m = re.match(r'/course/(\d+)', a.attrib['href'])
+                m = _RE_COURSE_URL.match(a.attrib['href'])
                 if m is None:
                     raise CannotUnderstand('course URL', a.attrib['href'])
                 yield Course(
@@ -425,16 +548,16 @@ class Client:
                     'page': page,
                 },
             ) as response:
-                html = lxml.html.fromstring(await response.text())
+                html = await parse_html_stream(self, response)
 
-            total_pages_strs = html.xpath('//input[@id="PageCombo"]/following-sibling::text()')
+            total_pages_strs = _XP_PAGE_COMBO(html)
             if total_pages_strs:
                 total_pages = int(total_pages_strs[0].rpartition('/')[2])
             else:
-                for href in html.xpath('//span[@class="page"]/span[@class="item"]/a/@href'):
+                for href in _XP_PAGE_ITEM_HREF(html):
                     total_pages = max(total_pages, int(qs_get(href, 'page')))
 
-            for a in html.xpath('//div[@class="tableBox"]//a[starts-with(@href, "/course/")]'):
+            for a in _XP_OPEN_COURSE_A(html):
                 id_ = int(os.path.basename(a.attrib['href']))
                 title = a.text
                 serial_div = a.getparent().getprevious()[0]
@@ -452,11 +575,26 @@ class Client:
         print()
 
     def get_dir_for(self, item: Downloadable) -> pathlib.Path:
-        d = self.data_dir / item.__class__.__name__.lower() / str(item.id)
-        d.mkdir(parents=True, exist_ok=True)
+        key = (item.__class__.__name__, item.id)
+        d = self._dir_cache.get(key)
+        if d is None:
+            d = self.data_dir / key[0].lower() / str(item.id)
+            d.mkdir(parents=True, exist_ok=True)
+            self._dir_cache[key] = d
         return d
 
 
+def _field_names(cls) -> tuple:
+    # dataclasses.fields rebuilds a tuple through reflection on every call;
+    # cache the names per class. Computed lazily because decorators like
+    # @dataclasses.dataclass only apply after class creation.
+    names = cls.__dict__.get('_FIELD_NAMES')
+    if names is None:
+        names = tuple(field.name for field in dataclasses.fields(cls))
+        cls._FIELD_NAMES = names
+    return names
+
+
 class Downloadable:
 
     _CLASSES: List[str] = []
@@ -471,29 +609,28 @@ class Downloadable:
 
     def get_meta(self) -> dict:
         return {
-            field.name: flatten_attribute(getattr(self, field.name))
-            for field in dataclasses.fields(self)
+            name: flatten_attribute(getattr(self, name)) for name in _field_names(self.__class__)
         }
 
     @classmethod
     def __init_subclass__(cls, **kwargs):
         super().__init_subclass__(**kwargs)
-        Downloadable._CLASSES.append(cls.__name__)
+        # interned names make the --ignore membership tests pointer compares
+        Downloadable._CLASSES.append(sys.intern(cls.__name__))
 
 
-@functools.singledispatch
-def flatten_attribute(value):
-    return value
+# Exact-type lookup is cheaper than singledispatch's MRO walk; this runs once
+# per field for every item dumped to meta.json.
+_ATTRIBUTE_FLATTENERS = {yarl.URL: str}
 
 
-@flatten_attribute.register
-def _(value: Downloadable):
-    return value.as_id_string()
-
-
-@flatten_attribute.register
-def _(value: yarl.URL):
-    return str(value)
+def flatten_attribute(value):
+    flattener = _ATTRIBUTE_FLATTENERS.get(type(value))
+    if flattener is not None:
+        return flattener(value)
+    if isinstance(value, Downloadable):
+        return value.as_id_string()
+    return value
 
 
 @dataclasses.dataclass
@@ -503,15 +640,40 @@ class Stat:
 
 
 class Downloader:
-    def __init__(self, client: Client):
+    def __init__(self, client: Client, concurrency: int = 8):
         self.client = client
+        self.concurrency = concurrency
         self.stats = collections.defaultdict(Stat)
         self.fullstats = collections.Counter()
-        self.rates = collections.deque(maxlen=20)
+        self._rate_anchor: Optional[tuple] = None
         self.rates_str = '  0.00Mbps'
         self.done: Optional[asyncio.Event] = None
         self.report_progress_task: Optional[asyncio.Task] = None
 
+        self._terminal_columns = shutil.get_terminal_size().columns
+        self._old_sigwinch_handler = None
+
+    def _on_terminal_resize(self, signum, frame):
+        self._terminal_columns = shutil.get_terminal_size().columns
+
+    def _install_resize_handler(self):
+        # get_terminal_size is an ioctl; look it up once and
+        # refresh on SIGWINCH instead of every progress tick
+        self._terminal_columns = shutil.get_terminal_size().columns
+        if hasattr(signal, 'SIGWINCH'):
+            try:
+                self._old_sigwinch_handler = signal.signal(
+                    signal.SIGWINCH, self._on_terminal_resize
+                )
+            except ValueError:
+                # not in the main thread
+                pass
+
+    def _restore_resize_handler(self):
+        if self._old_sigwinch_handler is not None:
+            signal.signal(signal.SIGWINCH, self._old_sigwinch_handler)
+            self._old_sigwinch_handler = None
+
     def mark_total(self, item):
         self.stats[item.STATS_NAME].total += 1
 
@@ -524,32 +686,49 @@ class Downloader:
         dl_size_str = f'{self.client.bytes_downloaded / 1e6:.1f}MB'
         print(
             f'{self.rates_str}  DL:{dl_size_str}  {progress_str}'.ljust(
-                max(1, shutil.get_terminal_size().columns - 1)
+                max(1, self._terminal_columns - 1)
             ),
             end='\r',
             file=sys.stderr,
         )
 
+    RATE_WINDOW = 10.0
+
     def update_rates(self):
         now = time.perf_counter()
         bandwidth = 0
-        if self.rates:
-            then, old_size = self.rates[0]
+        if self._rate_anchor is not None:
+            then, old_size = self._rate_anchor
             bandwidth = (self.client.bytes_downloaded - old_size) / (now - then)
-        self.rates.append((now, self.client.bytes_downloaded))
+        # Only the oldest sample is ever read, so a single anchor refreshed
+        # every RATE_WINDOW seconds replaces the former 20-entry deque.
+        if self._rate_anchor is None or now - self._rate_anchor[0] > self.RATE_WINDOW:
+            self._rate_anchor = (now, self.client.bytes_downloaded)
         self.rates_str = f'{bandwidth*8e-6:6.2f}Mbps'
 
     async def periodically_report_progress(self, done: asyncio.Event, period: float = 0.5):
-        while not done.is_set():
-            with contextlib.suppress(asyncio.TimeoutError):
-                await asyncio.wait_for(done.wait(), period)
+        # a chained call_later tick avoids the Future and TimerHandle churn
+        # asyncio.wait_for(done.wait(), period) would incur twice a second
+        loop = asyncio.get_event_loop()
+
+        def tick():
+            nonlocal handle
             self.update_rates()
             self.report_progress()
+            handle = loop.call_later(period, tick)
+
+        handle = loop.call_later(period, tick)
+        try:
+            await done.wait()
+        finally:
+            handle.cancel()
 
     def create_resume_file(self, data):
-        b = pickle.dumps(data)
-        sha256 = hashlib.sha256(b).hexdigest()
-        resume_file = self.client.data_dir / f'resume-{sha256[:7]}.pickle'
+        b = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        # the digest is only a dedup suffix for the filename,
+        # so use the fastest hash hashlib offers
+        digest = hashlib.blake2b(b, digest_size=4).hexdigest()
+        resume_file = self.client.data_dir / f'resume-{digest[:7]}.pickle'
         resume_file.write_bytes(b)
         return resume_file
 
@@ -562,6 +741,7 @@ class Downloader:
             self.mark_total(item)
 
         self.done = asyncio.Event()
+        self._install_resize_handler()
         self.report_progress_task = asyncio.create_task(
             self.periodically_report_progress(self.done),
         )
@@ -569,41 +749,44 @@ class Downloader:
         with capture_keyboard_interrupt() as interrupted:
 
             while items:
-                item = items[0]
+                # take up to self.concurrency items off the front of the
+                # queue and download them concurrently
+                batch = []
+                while items and len(batch) < self.concurrency:
+                    item = items.popleft()
 
-                if item.__class__.__name__ in ignore or item.as_id_string() in ignore:
-                    items.popleft()
-                    continue
+                    if item.__class__.__name__ in ignore or item.as_id_string() in ignore:
+                        continue
 
-                item_children = []
-
-                try:
-                    async for child in item.download(self.client):
-                        item_children.append(child)
-                        self.mark_total(child)
-
-                    with (self.client.get_dir_for(item) / 'meta.json').open(
-                        'w', encoding='utf-8'
-                    ) as file:
-                        json.dump(
-                            {
-                                **item.get_meta(),
-                                'children': [c.as_id_string() for c in item_children],
-                            },
-                            file,
-                        )
-                except Exception:
+                    batch.append(item)
+
+                results = await asyncio.gather(
+                    *(self._download_one(item) for item in batch),
+                    return_exceptions=True,
+                )
+
+                failed = []
+                children = []
+                for item, result in zip(batch, results):
+                    if isinstance(result, BaseException):
+                        failed.append((item, result))
+                    else:
+                        children.extend(result)
+                        self.mark_completed(item)
+
+                items.extend(children)
+
+                if failed:
+                    # put the failed items back so the resume file covers them
+                    items.extendleft(item for (item, _) in reversed(failed))
                     resume_file = self.create_resume_file(dict(items=items, ignore=ignore))
                     await self.finish()
+                    item, exc = failed[0]
                     raise DownloadFailed(
                         f'Error occurred while handling {item}\n'
                         f'Run with --resume={quote_path(resume_file)} to resume download.\n'
                         f'Run with --ignore={item.as_id_string()} to ignore this item.'
-                    )
-
-                items.popleft()
-                items.extend(item_children)
-                self.mark_completed(item)
+                    ) from exc
 
                 if interrupted.is_set():
                     print(file=sys.stderr)
@@ -611,15 +794,35 @@ class Downloader:
                     await self.finish()
                     print(
                         'Interrupted.\n'
-                        f'Run with --resume={quote_path(resume_file)} to resume download.\n'
-                        f'Run with --ignore={item.as_id_string()} to ignore this item.',
+                        f'Run with --resume={quote_path(resume_file)} to resume download.',
                         file=sys.stderr,
                     )
                     return
 
         await self.finish()
 
+    async def _download_one(self, item: Downloadable) -> List[Downloadable]:
+        item_children = []
+        async for child in item.download(self.client):
+            item_children.append(child)
+
+        for stats_name, count in collections.Counter(
+            child.STATS_NAME for child in item_children
+        ).items():
+            self.stats[stats_name].total += count
+
+        (self.client.get_dir_for(item) / 'meta.json').write_bytes(
+            json_dumps(
+                {
+                    **item.get_meta(),
+                    'children': [c.as_id_string() for c in item_children],
+                }
+            )
+        )
+        return item_children
+
     async def finish(self):
+        self._restore_resize_handler()
         self.done.set()
         assert self.report_progress_task is not None
         await self.report_progress_task
@@ -634,7 +837,7 @@ class Downloader:
 
 def html_get_main(html: lxml.html.HtmlElement) -> lxml.html.HtmlElement:
     NoPermission.check(html)
-    mains = html.xpath('//div[@id="main"]')
+    mains = _XP_MAIN(html)
     if not mains:
         raise Unavailable(
             '//div[@id="main"] not found: {}'.format(
@@ -642,16 +845,13 @@ def html_get_main(html: lxml.html.HtmlElement) -> lxml.html.HtmlElement:
             )
         )
     main = mains[0]
-    for to_remove in itertools.chain(
-        main.xpath('div[@class="infoPath"]'),
-        main.xpath('.//script'),
-    ):
+    for to_remove in _XP_MAIN_JUNK(main):
         to_remove.getparent().remove(to_remove)
     return main
 
 
 def table_is_empty(html: lxml.html.HtmlElement) -> bool:
-    second_row_tds = html.xpath('//div[@class="tableBox"]/table/tr[2]/td')
+    second_row_tds = _XP_SECOND_ROW_TD(html)
     if len(second_row_tds) == 1:
         # 目前尚無資料 or No Data
         assert second_row_tds[0].text in ('目前尚無資料', 'No Data')
@@ -661,7 +861,7 @@ def table_is_empty(html: lxml.html.HtmlElement) -> bool:
 
 def get_attachments(parent: Downloadable, element: lxml.html.HtmlElement) -> Iterator['Attachment']:
     ids = set()
-    for a in element.xpath('.//a[starts-with(@href, "/sys/read_attach.php")]'):
+    for a in _XP_ATTACH_A(element):
         if a.text is None or not a.text.strip():
             continue
         url = yarl.URL(a.attrib['href'])
@@ -697,9 +897,8 @@ class Course(Downloadable):
             self.get_scores(client),
             self.get_grouplists(client),
         ]
-        for generator in generators:
-            async for item in generator:
-                yield item
+        async for item in merge_async_generators(*generators):
+            yield item
 
         async with client.request(
             'GET',
@@ -709,50 +908,82 @@ class Course(Downloadable):
                 'f': 'syllabus',
             },
         ) as response:
-            html = lxml.html.fromstring(await response.text())
+            html = await parse_html_stream(client, response)
 
         main = html_get_main(html)
         with (client.get_dir_for(self) / 'index.html').open('wb') as file:
-            file.write(lxml.html.tostring(main))
+            lxml.etree.ElementTree(main).write(file, method='html')
 
-    async def _item_paginator(self, client, f, page=1):
-        for page in itertools.count(page):
-            async with client.request(
-                'GET',
-                f'{TARGET_ORIGIN}/course.php',
-                params={
-                    'courseID': self.id,
-                    'f': f,
-                    'page': page,
-                },
-            ) as response:
-                html = lxml.html.fromstring(await response.text())
-
-                if table_is_empty(html):
-                    break
+    PAGE_CONCURRENCY = 5
 
-                yield html
+    async def _get_page(self, client, f, page) -> lxml.html.HtmlElement:
+        async with client.request(
+            'GET',
+            f'{TARGET_ORIGIN}/course.php',
+            params={
+                'courseID': self.id,
+                'f': f,
+                'page': page,
+            },
+        ) as response:
+            return await parse_html_stream(client, response)
 
-                next_hrefs = html.xpath('//span[@class="page"]//a[text()="Next"]/@href')
+    async def _item_paginator(self, client, f, page=1):
+        html = await self._get_page(client, f, page)
+        if table_is_empty(html):
+            return
+        yield html
+
+        total_pages_strs = _XP_PAGE_COMBO(html)
+        if total_pages_strs:
+            # The page count is known up front; prefetch the remaining pages
+            # concurrently and yield them in order.
+            total_pages = int(total_pages_strs[0].rpartition('/')[2])
+            semaphore = asyncio.Semaphore(self.PAGE_CONCURRENCY)
+
+            async def get_page_bounded(p):
+                async with semaphore:
+                    return await self._get_page(client, f, p)
+
+            tasks = [
+                asyncio.create_task(get_page_bounded(p)) for p in range(page + 1, total_pages + 1)
+            ]
+            try:
+                for task in tasks:
+                    html = await task
+                    if not table_is_empty(html):
+                        yield html
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+        else:
+            while True:
+                next_hrefs = _XP_NEXT_HREF(html)
                 if not next_hrefs:
                     break
                 next_page = int(qs_get(next_hrefs[0], 'page'))
                 assert page + 1 == next_page
+                page = next_page
+                html = await self._get_page(client, f, page)
+                if table_is_empty(html):
+                    break
+                yield html
 
     async def get_announcements(self, client) -> AsyncGenerator['Announcement', None]:
         async for html in self._item_paginator(client, 'news'):
-            for tr in html.xpath('//*[@id="main"]//tr[@class!="header"]'):
-                (href,) = tr.xpath('td[1]/a/@href')
-                (title,) = tr.xpath('td[2]//a/text()')
+            for tr in _XP_ITEM_ROWS(html):
+                (link,) = _XP_ROW_LINK(tr)
+                (title_a,) = _XP_ROW_TITLE_A(tr)
                 yield Announcement(
-                    id=int(qs_get(href, 'newsID')),
-                    title=title,
+                    id=int(qs_get(link.attrib['href'], 'newsID')),
+                    title=title_a.text,
                     course=self,
                 )
 
     async def get_materials(self, client) -> AsyncGenerator['Material', None]:
         async for html in self._item_paginator(client, 'doclist'):
-            for a in html.xpath('//*[@id="main"]//tr[@class!="header"]/td[2]/div/a'):
+            for a in _XP_MATERIAL_A(html):
                 url = yarl.URL(a.attrib['href'])
                 if url.path != '/course.php' or url.query['f'] != 'doc':
                     # linked material (the copy should still be downloaded)
@@ -767,22 +998,22 @@ class Course(Downloadable):
 
     async def get_discussions(self, client) -> AsyncGenerator['Discussion', None]:
         async for html in self._item_paginator(client, 'forumlist'):
-            for tr in html.xpath('//*[@id="main"]//tr[@class!="header"]'):
-                if tr.xpath('.//img[@class="vmiddle"]'):
+            for tr in _XP_ITEM_ROWS(html):
+                if _XP_ROW_VMIDDLE(tr):
                     # XXX: belongs to a homework, material
                     # don't know if it is accessible
                     continue
-                (href,) = tr.xpath('td[1]/a/@href')
-                (title,) = tr.xpath('td[2]//a/span/text()')
+                (link,) = _XP_ROW_LINK(tr)
+                (title_span,) = _XP_ROW_TITLE_SPAN(tr)
                 yield Discussion(
-                    id=int(qs_get(href, 'tid')),
-                    title=title,
+                    id=int(qs_get(link.attrib['href'], 'tid')),
+                    title=title_span.text,
                     course=self,
                 )
 
     async def get_homeworks(self, client) -> AsyncGenerator['Homework', None]:
         async for html in self._item_paginator(client, 'hwlist'):
-            for a in html.xpath('//*[@id="main"]//tr[@class!="header"]/td[2]/a[1]'):
+            for a in _XP_HOMEWORK_A(html):
                 yield Homework(
                     id=int(qs_get(a.attrib['href'], 'hw')),
                     title=a.text,
@@ -798,10 +1029,8 @@ class Course(Downloadable):
                 'courseID': self.id,
             },
         ) as response:
-            html = lxml.html.fromstring(await response.text())
-            if not html.xpath(
-                '//div[@id="main"]//input[@type="button" and @onclick="history.back()"]'
-            ):
+            html = await parse_html_stream(client, response)
+            if not _XP_SCORE_BACK_BUTTON(html):
                 yield Score(course=self)
 
     async def get_grouplists(self, client) -> AsyncGenerator['GroupList', None]:
@@ -813,7 +1042,7 @@ class Course(Downloadable):
                 'courseID': self.id,
             },
         ) as response:
-            html = lxml.html.fromstring(await response.text())
+            html = await parse_html_stream(client, response)
             if not table_is_empty(html):
                 yield GroupList(course=self)
 
@@ -837,7 +1066,7 @@ class Announcement(Downloadable):
                 'type': 'n',
             },
         ) as response:
-            body_json = await response.json(content_type=None)
+            body_json = json_loads(await client.read_counted(response))
 
         if body_json['news']['note'] == 'NA' and body_json['news']['poster'] == '':
             raise Unavailable(body_json)
@@ -847,8 +1076,7 @@ class Announcement(Downloadable):
             for attachment in get_attachments(self, lxml.html.fromstring(attachment_raw_div)):
                 yield attachment
 
-        with (client.get_dir_for(self) / 'index.json').open('w', encoding='utf-8') as file:
-            json.dump(body_json, file)
+        (client.get_dir_for(self) / 'index.json').write_bytes(json_dumps(body_json))
 
 
 @dataclasses.dataclass
@@ -872,7 +1100,7 @@ class Material(Downloadable):
                 'cid': self.id,
             },
         ) as response:
-            html = lxml.html.fromstring(await response.text())
+            html = await parse_html_stream(client, response)
         main = html_get_main(html)
 
         for attachment in get_attachments(self, main):
@@ -884,7 +1112,7 @@ class Material(Downloadable):
                 yield video
 
         with (client.get_dir_for(self) / 'index.html').open('wb') as file:
-            file.write(lxml.html.tostring(main))
+            lxml.etree.ElementTree(main).write(file, method='html')
 
     async def get_video(self, client: Client, base_url: yarl.URL) -> Union[None, 'Video']:
         async with client.request(
@@ -898,7 +1126,7 @@ class Material(Downloadable):
                 'area_size': '724x3',
             },
         ) as response:
-            body_json = await response.json(content_type=None)
+            body_json = json_loads(await client.read_counted(response))
         if body_json['ret']['status'] != 'true':
             raise CannotUnderstand(f'Video not found: {self}, {body_json}')
         if body_json['ret']['player_width'] is None:
@@ -907,7 +1135,7 @@ class Material(Downloadable):
             # "player_width":null,"player_height":null}}
             return None
         html = lxml.html.fromstring(body_json['ret']['embed'])
-        (src,) = html.xpath('//video/@src')
+        (src,) = _XP_VIDEO_SRC(html)
         return Video(id=self.id, url=base_url.join(yarl.URL(src)))
 
 
@@ -929,7 +1157,7 @@ class Discussion(Downloadable):
                 'id': self.id,
             },
         ) as response:
-            body_json = await response.json(content_type=None)
+            body_json = json_loads(await client.read_counted(response))
             if body_json['posts']['status'] != 'true':
                 raise CannotUnderstand(body_json)
 
@@ -941,8 +1169,7 @@ class Discussion(Downloadable):
                         parent=self,
                     )
 
-            with (client.get_dir_for(self) / 'index.json').open('w', encoding='utf-8') as file:
-                json.dump(body_json, file)
+            (client.get_dir_for(self) / 'index.json').write_bytes(json_dumps(body_json))
 
 
 @dataclasses.dataclass
@@ -956,49 +1183,66 @@ class Homework(Downloadable):
     STATS_NAME = 'Page'
 
     async def download(self, client: Client):
+        out_dir = client.get_dir_for(self)
+
+        async def fetch(f: str) -> lxml.html.HtmlElement:
+            async with client.request(
+                'GET',
+                f'{TARGET_ORIGIN}/course.php',
+                params={
+                    'courseID': self.course.id,
+                    'f': f,
+                    'hw': self.id,
+                },
+            ) as response:
+                return await parse_html_stream(client, response)
+
+        # The description and submission-list pages are independent; fetch
+        # them concurrently and parse in the original order. The surviving
+        # task is cancelled and awaited if the other one fails, so no fetch
+        # is left running unretrieved.
+        tasks = [asyncio.create_task(fetch('hw')), asyncio.create_task(fetch('hw_doclist'))]
+        try:
+            hw_html, doclist_html = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
         # homework description
-        async with client.request(
-            'GET',
-            f'{TARGET_ORIGIN}/course.php',
-            params={
-                'courseID': self.course.id,
-                'f': 'hw',
-                'hw': self.id,
-            },
-        ) as response:
-            html = lxml.html.fromstring(await response.text())
-        main = html_get_main(html)
-        for to_remove in main.xpath('.//span[@class="toolWrapper"]'):
+        main = html_get_main(hw_html)
+        for to_remove in _XP_TOOLWRAPPER(main):
             to_remove.getparent().remove(to_remove)
 
         for attachment in get_attachments(self, main):
             yield attachment
 
-        with (client.get_dir_for(self) / 'index.html').open('wb') as file:
-            file.write(lxml.html.tostring(main))
+        with (out_dir / 'index.html').open('wb') as file:
+            lxml.etree.ElementTree(main).write(file, method='html')
 
         # submitted homework
-        async with client.request(
-            'GET',
-            f'{TARGET_ORIGIN}/course.php',
-            params={
-                'courseID': self.course.id,
-                'f': 'hw_doclist',
-                'hw': self.id,
-            },
-        ) as response:
-            html = lxml.html.fromstring(await response.text())
-
-        main = html_get_main(html)
+        main = html_get_main(doclist_html)
 
         if table_is_empty(main):
             return
 
-        (header_tr,) = main.xpath('.//div[@class="tableBox"]//tr[@class="header"]')
+        # A single traversal collects the header and the data rows together
+        # instead of walking the tableBox once per kind of row.
+        header_trs = []
+        rows = []
+        for tr in _XP_HW_ALL_TR(doclist_html):
+            tr_class = tr.get('class')
+            if tr_class == 'header':
+                header_trs.append(tr)
+            elif tr_class is not None:
+                rows.append(tr)
+
+        (header_tr,) = header_trs
         field_indexes = {}
         for i, td in enumerate(header_tr):
             try:
-                (a,) = td.xpath('a')
+                (a,) = td.findall('a')
             except ValueError:
                 continue
             field_indexes[qs_get(a.attrib['href'], 'order')] = i
@@ -1008,22 +1252,31 @@ class Homework(Downloadable):
         iname = field_indexes['name']
         assert iname > ititle
 
-        for tr in main.xpath('//div[@class="tableBox"]//tr[@class!="header"]'):
-            a_s = tr[ititle].xpath('div/a')
+        # local bindings keep the row loop free of per-iteration global
+        # lookups on pages with many submissions
+        xp_div_a = _XP_HW_DIV_A
+        xp_comment = _XP_HW_COMMENT
+        xp_by = _XP_HW_BY
+        get_cid = qs_get
+        for tr in rows:
+            # tr[k] walks the child linked list from the start each time;
+            # materialize the cells once per row instead.
+            cells = list(tr)
+            a_s = xp_div_a(cells[ititle])
             if not a_s:
                 continue
             (a,) = a_s
-            id_ = int(qs_get(a.attrib['href'], 'cid'))
+            id_ = int(get_cid(a.attrib['href'], 'cid'))
             title = a.text
 
-            comments = tr[ititle].xpath('div/img[@src="/sys/res/icon/hw_comment.png"]/@title')
+            comments = xp_comment(cells[ititle])
             if comments:
                 (comment,) = comments
             else:
                 comment = None
 
             # Group homework may hide behind a <a>
-            (by,) = tr[iname].xpath('div/text()|div/a/text()')
+            (by,) = xp_by(cells[iname])
 
             yield SubmittedHomework(
                 id=id_,
@@ -1033,8 +1286,8 @@ class Homework(Downloadable):
                 course=self.course,
             )
 
-        with (client.get_dir_for(self) / 'list.html').open('wb') as file:
-            file.write(lxml.html.tostring(main))
+        with (out_dir / 'list.html').open('wb') as file:
+            lxml.etree.ElementTree(main).write(file, method='html')
 
 
 @dataclasses.dataclass
@@ -1061,15 +1314,18 @@ class SubmittedHomework(Downloadable):
                 'cid': self.id,
             },
         ) as response:
-            html = lxml.html.fromstring(await response.text())
+            html = await parse_html_stream(client, response)
 
         main = html_get_main(html)
 
         for attachment in get_attachments(self, main):
             yield attachment
 
+        # index.html must stay the extracted #main fragment (ilmsserve embeds
+        # it into its own page shell), so the raw response bytes cannot be
+        # written here even though this method does not mutate the tree.
         with (client.get_dir_for(self) / 'index.html').open('wb') as file:
-            file.write(lxml.html.tostring(main))
+            lxml.etree.ElementTree(main).write(file, method='html')
 
 
 @dataclasses.dataclass
@@ -1096,11 +1352,11 @@ class SinglePageDownloadable(Downloadable):
                 **self.extra_params,
             },
         ) as response:
-            html = lxml.html.fromstring(await response.text())
+            html = await parse_html_stream(client, response)
             main = html_get_main(html)
 
             with (client.get_dir_for(self) / 'index.html').open('wb') as file:
-                file.write(lxml.html.tostring(main))
+                lxml.etree.ElementTree(main).write(file, method='html')
 
 
 class Score(SinglePageDownloadable):
@@ -1129,7 +1385,7 @@ class Attachment(Downloadable):
 
     @as_empty_async_generator
     async def download(self, client):
-        async with client.request(
+        async with client.download_semaphore, client.request(
             'GET',
             f'{TARGET_ORIGIN}/sys/read_attach.php',
             params={
@@ -1137,10 +1393,7 @@ class Attachment(Downloadable):
             },
         ) as response:
             with (client.get_dir_for(self) / self.suggest_filename()).open('wb') as file:
-                async for chunk in response.content.iter_any():
-                    if not _workaround_client_response_content_is_traced:
-                        client.bytes_downloaded += len(chunk)
-                    file.write(chunk)
+                client.bytes_downloaded += await drain_to_file(response, file)
 
     def get_meta(self) -> dict:
         return {
@@ -1164,26 +1417,29 @@ class Video(Downloadable):
 
     @as_empty_async_generator
     async def download(self, client):
-        async with client.request('GET', self.url) as response:
+        async with client.download_semaphore, client.request('GET', self.url) as response:
             with (client.get_dir_for(self) / 'video.mp4').open('wb') as file:
-                async for chunk in response.content.iter_any():
-                    if not _workaround_client_response_content_is_traced:
-                        client.bytes_downloaded += len(chunk)
-                    file.write(chunk)
+                client.bytes_downloaded += await drain_to_file(response, file)
 
 
 def generate_table(items):
-    fields = [field.name for field in dataclasses.fields(items[0])]
+    fields = _field_names(items[0].__class__)
     rows = [fields]
     rows.extend([str(getattr(item, field)) for field in fields] for item in items)
-    widths = [max(map(wcwidth.wcswidth, col)) for col in zip(*rows)]
+    # wcswidth iterates every character in Python; measure each cell once and
+    # reuse the widths for both the column maxima and the padding. The local
+    # binding skips the module attribute lookup per cell.
+    wcswidth = wcwidth.wcswidth
+    cell_widths = [[wcswidth(cell) for cell in row] for row in rows]
+    widths = [max(col) for col in zip(*cell_widths)]
     for i, row in enumerate(rows):
+        row_widths = cell_widths[i]
         for j, (width, cell) in enumerate(zip(widths, row)):
             if j:
                 yield '  '
             yield cell
             if j + 1 < len(row):
-                yield ' ' * (width - wcwidth.wcswidth(cell))
+                yield ' ' * (width - row_widths[j])
         yield '\n'
         if i == 0:
             for j, width in enumerate(widths):
@@ -1194,21 +1450,48 @@ def generate_table(items):
 
 
 def print_table(items):
-    print(end=''.join(generate_table(items)))
+    sys.stdout.writelines(generate_table(items))
+
+
+COURSE_FETCH_CONCURRENCY = 8
 
 
 async def foreach_course(
     client: Client, course_ids: List[Union[str, int]]
 ) -> AsyncGenerator[Course, None]:
-    for course_id in course_ids:
+    async def bounded_get(course_id: int, semaphore: asyncio.Semaphore) -> Course:
+        async with semaphore:
+            return await client.get_course(course_id)
+
+    index = 0
+    while index < len(course_ids):
+        course_id = course_ids[index]
         if course_id == 'enrolled':
             async for course in client.get_enrolled_courses():
                 yield course
+            index += 1
         elif course_id == 'open':
             async for course in client.get_open_courses():
                 yield course
+            index += 1
         else:
-            yield await client.get_course(int(course_id))
+            # Resolve a run of plain course ids concurrently, yielding the
+            # courses in the order they were given.
+            end = index
+            while end < len(course_ids) and course_ids[end] not in ('enrolled', 'open'):
+                end += 1
+            semaphore = asyncio.Semaphore(COURSE_FETCH_CONCURRENCY)
+            tasks = [
+                asyncio.create_task(bounded_get(int(course_id), semaphore))
+                for course_id in course_ids[index:end]
+            ]
+            try:
+                for task in tasks:
+                    yield await task
+            finally:
+                for task in tasks:
+                    task.cancel()
+            index = end
 
 
 def validate_course_id(ctx, param, value: str):
@@ -1327,7 +1610,7 @@ You can add --no-resume-check to bypass this check if you are sure what you are
             changed |= login
 
         targets = []
-        ignores = set(ignore)
+        ignores = {sys.intern(x) for x in ignore}
         if resume is not None:
             with open(resume, 'rb') as file:
                 resmue_data = pickle.load(file)
@@ -1336,13 +1619,13 @@ You can add --no-resume-check to bypass this check if you are sure what you are
         if course_ids:
             courses = [course async for course in foreach_course(client, course_ids)]
             if courses:
-                print(end=''.join(generate_table(courses)))
+                sys.stdout.writelines(generate_table(courses))
             targets.extend(courses)
 
         if targets:
             changed = True
             if not dry:
-                await d.run(targets, ignore=set(ignore))
+                await d.run(targets, ignore=frozenset(ignores))
         if not changed:
             click.echo('Nothing to do', err=True)
 
@@ -3,6 +3,7 @@ This module implements illegal filename handling like
 how it is done in chromium
 """
 
+import functools
 import unicodedata
 
 
@@ -31,11 +32,26 @@ def is_illegal_at_ends(c: str):
     return c.isspace() or c == '.'
 
 
+@functools.lru_cache
+def _ascii_translation_table(replace_char: str):
+    return {i: replace_char for i in range(128) if is_illegal_anywhere(chr(i))}
+
+
 def replace_illegal_characters_in_path(file_name: str, replace_char: str):
     """
     ReplaceIllegalCharactersInPath()
     https://source.chromium.org/chromium/chromium/src/+/master:base/i18n/file_util_icu.cc;l=105;drc=e45616a746204e7405d3e2414675978597817414
     """
+    if file_name.isascii():
+        # The common all-ASCII case replaces illegal characters with one
+        # C-level str.translate instead of a category lookup per character;
+        # only the ends still need the whitespace/dot check.
+        result = file_name.translate(_ascii_translation_table(replace_char))
+        if result and is_illegal_at_ends(result[0]):
+            result = replace_char + result[1:]
+        if result and is_illegal_at_ends(result[-1]):
+            result = result[:-1] + replace_char
+        return result
     return ''.join(
         replace_char
         if (
@@ -1,5 +1,6 @@
 import os
 import pathlib
+import time
 
 import pytest
 
@@ -43,6 +44,71 @@ async def test_clear_credentials(client):
     assert client.clear_credentials() is False
 
 
+@pytest.mark.asyncio
+async def test_ensure_authenticated_fresh_credentials(client: ilmsdump.Client):
+    with open(client.cred_path, 'w', encoding='utf-8') as file:
+        print('freshsessid', file=file)
+        print(int(time.time()), file=file)
+
+    async def get_login_state():
+        raise AssertionError('fresh credentials should skip validation')
+
+    client.get_login_state = get_login_state
+    await client.ensure_authenticated(prompt=False)
+
+    assert client.get_phpsessid() == 'freshsessid'
+
+
+@pytest.mark.asyncio
+async def test_ensure_authenticated_stale_credentials(client: ilmsdump.Client):
+    with open(client.cred_path, 'w', encoding='utf-8') as file:
+        print('stalesessid', file=file)
+        print(int(time.time()) - 2 * ilmsdump.CREDENTIALS_MAX_AGE, file=file)
+
+    async def get_login_state():
+        return 'someone'
+
+    client.get_login_state = get_login_state
+    await client.ensure_authenticated(prompt=False)
+
+    assert client.get_phpsessid() == 'stalesessid'
+    # re-validation refreshed the saved timestamp
+    with open(client.cred_path, encoding='utf-8') as file:
+        phpsessid, timestamp = file.read().splitlines()
+    assert phpsessid == 'stalesessid'
+    assert time.time() - float(timestamp) < ilmsdump.CREDENTIALS_MAX_AGE
+
+
+@pytest.mark.asyncio
+async def test_ensure_authenticated_legacy_credentials(client: ilmsdump.Client):
+    with open(client.cred_path, 'w', encoding='utf-8') as file:
+        print('legacysessid', file=file)
+
+    validated = 0
+
+    async def get_login_state():
+        nonlocal validated
+        validated += 1
+        return 'someone'
+
+    client.get_login_state = get_login_state
+    await client.ensure_authenticated(prompt=False)
+
+    assert validated == 1
+    assert client.get_phpsessid() == 'legacysessid'
+
+
+@pytest.mark.asyncio
+async def test_save_credentials(client: ilmsdump.Client):
+    client._set_phpsessid_cookie('somesessid')
+    client.save_credentials()
+
+    with open(client.cred_path, encoding='utf-8') as file:
+        phpsessid, timestamp = file.read().splitlines()
+    assert phpsessid == 'somesessid'
+    assert float(timestamp) <= time.time()
+
+
 @pytest.mark.asyncio
 async def test_get_login_state_anonymous(client):
     assert await client.get_login_state() is None
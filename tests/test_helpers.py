@@ -1,3 +1,4 @@
+import asyncio
 import os
 import pathlib
 import signal
@@ -72,6 +73,45 @@ async def test_empty_async_generator():
     assert called == 1
 
 
+@pytest.mark.asyncio
+async def test_merge_async_generators():
+    async def agen(items):
+        for item in items:
+            yield item
+
+    merged = ilmsdump.merge_async_generators(agen([1, 2, 3]), agen(['a', 'b']))
+    results = [item async for item in merged]
+
+    # items from each source keep their order; sources are interleaved
+    assert [item for item in results if isinstance(item, int)] == [1, 2, 3]
+    assert [item for item in results if isinstance(item, str)] == ['a', 'b']
+    assert len(results) == 5
+
+
+@pytest.mark.asyncio
+async def test_merge_async_generators_propagates_and_cancels():
+    cancelled = asyncio.Event()
+
+    async def failing():
+        yield 1
+        raise ValueError
+
+    async def hanging():
+        try:
+            while True:
+                await asyncio.sleep(60)
+                yield
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    with pytest.raises(ValueError):
+        async for _ in ilmsdump.merge_async_generators(failing(), hanging()):
+            pass
+
+    assert cancelled.is_set()
+
+
 @pytest.mark.skip()
 @pytest.mark.asyncio
 async def test_capture_keyboard_interrupt():